@@ -0,0 +1,51 @@
+"""
+Last-known-good answers, served (stale) only while Bedrock is degraded.
+
+In-process LRU keyed by (model id, normalized question). Not shared between tasks
+and lost on restart, which is fine for a fallback that only needs to cover an outage.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+ANSWER_CACHE_MAX = int(os.getenv("ANSWER_CACHE_MAX", "1000"))
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _normalize(message: str) -> str:
+    return _WS_RE.sub(" ", message.strip().lower()).rstrip("?？.!。 ")
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, model_id: str, message: str, answer: str):
+        key = (model_id, _normalize(message))
+        with self._lock:
+            self._data[key] = (answer, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get(self, model_id: str, message: str):
+        """Return (answer, age_seconds) or None."""
+        key = (model_id, _normalize(message))
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+        answer, stored_at = entry
+        return answer, time.time() - stored_at
+
+    def __len__(self):
+        return len(self._data)
+
+
+answer_cache = AnswerCache()
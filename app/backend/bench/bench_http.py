@@ -0,0 +1,90 @@
+"""
+HTTP benchmark harness for the chat API (stdlib only, no extra deps).
+
+Measures wire size and latency per Accept-Encoding against a running backend:
+
+  # local
+  uvicorn main:app --port 8080
+  python bench/bench_http.py --base-url http://127.0.0.1:8080
+
+  # through CloudFront -> ALB -> ECS
+  python bench/bench_http.py --base-url https://<cloudfront_domain> -n 20
+
+Each request opens one keep-alive connection per encoding and reuses it,
+so the numbers reflect connection reuse (CloudFront/ALB/uvicorn keep-alive).
+"""
+import argparse
+import http.client
+import json
+import statistics
+import time
+from urllib.parse import urlparse
+
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+def _connect(base_url: str, timeout: float):
+    u = urlparse(base_url)
+    if u.scheme == "https":
+        return http.client.HTTPSConnection(u.netloc, timeout=timeout)
+    return http.client.HTTPConnection(u.netloc, timeout=timeout)
+
+
+def _pct(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def run(base_url: str, path: str, message: str, n: int, timeout: float):
+    body = json.dumps({"message": message}).encode("utf-8")
+    prefix = urlparse(base_url).path.rstrip("/")
+    results = {}
+
+    for enc in ENCODINGS:
+        conn = _connect(base_url, timeout)
+        latencies, sizes, served = [], [], set()
+        for _ in range(n):
+            t0 = time.perf_counter()
+            conn.request(
+                "POST",
+                prefix + path,
+                body=body,
+                headers={"Content-Type": "application/json", "Accept-Encoding": enc},
+            )
+            resp = conn.getresponse()
+            raw = resp.read()
+            latencies.append((time.perf_counter() - t0) * 1000)
+            sizes.append(len(raw))
+            served.add(resp.getheader("Content-Encoding") or "identity")
+        conn.close()
+
+        results[enc] = {
+            "content_encoding": sorted(served),
+            "bytes_avg": int(statistics.mean(sizes)),
+            "p50_ms": round(_pct(latencies, 50), 1),
+            "p95_ms": round(_pct(latencies, 95), 1),
+        }
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat API payload size / latency benchmark")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--path", default="/api/chat")
+    parser.add_argument("--message", default="Explain how a CDN works in detail.")
+    parser.add_argument("-n", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    results = run(args.base_url, args.path, args.message, args.n, args.timeout)
+    print(f"{'accept':<10} {'served':<12} {'bytes':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for enc, r in results.items():
+        print(f"{enc:<10} {','.join(r['content_encoding']):<12} {r['bytes_avg']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
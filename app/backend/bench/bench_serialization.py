@@ -0,0 +1,66 @@
+"""
+Micro-benchmark: per-request framework tax of /api/chat (no network, no Bedrock).
+
+  cd app/backend
+  BEDROCK_MODEL_ID=dummy python bench/bench_serialization.py
+
+Stages measured per call:
+  - parse:      JSON body -> ChatRequest (pydantic validation incl. size limit)
+  - serialize:  ChatResponse -> bytes (orjson vs stdlib json)
+  - end-to-end: TestClient POST on the deterministic path (routing + middleware + both above)
+
+Fargate 0.25 vCPU is a time-sliced share of one core, so multiply the numbers
+measured on a dev machine by roughly 4 for a worst-case estimate on the task.
+"""
+import json
+import os
+import sys
+import timeit
+
+import orjson
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("BEDROCK_MODEL_ID", "dummy")
+
+from schemas import ChatRequest, ChatResponse  # noqa: E402
+
+SHORT_BODY = json.dumps({"message": "Tell me a short joke."}).encode("utf-8")
+LONG_BODY = json.dumps({"message": "x" * 3900}).encode("utf-8")
+ANSWER = ChatResponse(question="Tell me a short joke.", answer="lorem ipsum " * 200)
+
+
+def _us_per_call(fn, number: int) -> float:
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main():
+    number = int(os.getenv("BENCH_N", "20000"))
+    rows = [
+        ("parse short (pydantic)", lambda: ChatRequest.model_validate_json(SHORT_BODY)),
+        ("parse 3.9k chars (pydantic)", lambda: ChatRequest.model_validate_json(LONG_BODY)),
+        ("parse short (json.loads only)", lambda: json.loads(SHORT_BODY)),
+        ("serialize 2.4k answer (orjson)", lambda: orjson.dumps(ANSWER.model_dump())),
+        ("serialize 2.4k answer (json)", lambda: json.dumps(ANSWER.model_dump()).encode("utf-8")),
+    ]
+
+    try:
+        from fastapi.testclient import TestClient
+        from main import app
+
+        client = TestClient(app)
+        rows.append((
+            "end-to-end POST /api/chat (time)",
+            lambda: client.post("/api/chat", json={"message": "what time is it?"}),
+        ))
+    except ImportError as e:  # httpx is only needed for the end-to-end row
+        print(f"[bench] skip end-to-end: {e}")
+
+    print(f"{'stage':<36} {'us/call':>10}")
+    for name, fn in rows:
+        n = number if "end-to-end" not in name else max(1, number // 20)
+        print(f"{name:<36} {_us_per_call(fn, n):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Circuit breaker for the Bedrock call path (one breaker per model id).
+
+  closed    -> calls pass; N consecutive outage errors -> open
+  open      -> calls fail fast (CircuitOpenError) for `open_seconds`
+  half_open -> one probe call passes, others fail fast;
+               probe ok -> closed, probe fails -> open again
+
+Only the probe can close the circuit: calls admitted before it opened that
+finish late (success or failure) leave an open / half-open circuit unchanged.
+
+Only errors the caller classifies as outages (timeouts, throttling, 5xx) count;
+bad input must not open the circuit for everyone.
+"""
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"circuit '{name}' is open (retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        open_seconds: float = 30.0,
+        is_failure=lambda e: True,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.is_failure = is_failure
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_error = None
+
+    # -----------------------------
+    # state
+    # -----------------------------
+    def _current_state(self) -> str:
+        # caller holds the lock
+        if self._state == OPEN and self.clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+            print(f"[circuit] {self.name}: open -> half_open")
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            retry_after = max(0.0, self.open_seconds - (self.clock() - self._opened_at)) if state == OPEN else 0.0
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "retry_after_seconds": round(retry_after, 1),
+                "last_error": self._last_error,
+            }
+
+    def _open(self):
+        # caller holds the lock
+        if self._state != OPEN:
+            print(f"[circuit] {self.name}: {self._state} -> open ({self._last_error})")
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self._probe_in_flight = False
+
+    # -----------------------------
+    # call path
+    # -----------------------------
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if this call must fail fast; return True for the half-open probe."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return False
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            retry_after = max(0.0, self.open_seconds - (self.clock() - self._opened_at))
+            raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self, probe: bool = False):
+        with self._lock:
+            if probe:
+                print(f"[circuit] {self.name}: {self._state} -> closed")
+                self._state = CLOSED
+                self._failures = 0
+                self._probe_in_flight = False
+            elif self._state == CLOSED:
+                self._failures = 0
+            # open / half_open: only the probe may close the circuit
+
+    def record_failure(self, error: Exception, probe: bool = False):
+        if not self.is_failure(error):
+            # not an outage: the service answered, so treat it like a success
+            self.record_success(probe)
+            return
+        with self._lock:
+            self._last_error = type(error).__name__
+            if probe:
+                self._open()
+            elif self._state == CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._open()
+            # open / half_open: a call admitted before the circuit opened changes nothing
+
+    def call(self, fn, *args, **kwargs):
+        probe = self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e, probe)
+            raise
+        self.record_success(probe)
+        return result
+
+
+class BreakerRegistry:
+    """One breaker per key (model id), created on first use with shared settings."""
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(key, **self.settings)
+                self._breakers[key] = breaker
+            return breaker
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {b.name: b.snapshot() for b in breakers}
+
+    def degraded(self) -> bool:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return any(b.state != CLOSED for b in breakers)
@@ -1,12 +1,76 @@
 ﻿import json
 import os
+import time
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
 import boto3
-from fastapi import FastAPI
+import orjson
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError, ParamValidationError
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 
-app = FastAPI()
+import token_budget
+from answer_cache import answer_cache
+from circuit_breaker import BreakerRegistry, CircuitOpenError
+from schemas import ChatRequest, ChatResponse, ErrorResponse, HealthResponse
+from usage_ledger import ledger
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli is optional, gzip always works
+    BrotliMiddleware = None
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON via orjson (fastapi's bundled ORJSONResponse is deprecated in newer releases)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    ledger.start()
+    yield
+    # flush + ship the open ledger segment before the task stops
+    ledger.close()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# Responses smaller than this are sent as-is (compression overhead > saving)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+
+class CompressionMiddleware:
+    """
+    Brotli (gzip fallback) for normal responses; SSE is never compressed.
+    Compressors buffer output, which would hold back server-sent events,
+    so requests that accept text/event-stream bypass compression entirely.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.plain = app
+        if BrotliMiddleware is not None:
+            self.compressed = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            accept = dict(scope.get("headers") or []).get(b"accept", b"")
+            if b"text/event-stream" in accept:
+                await self.plain(scope, receive, send)
+                return
+        await self.compressed(scope, receive, send)
+
+
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,22 +92,89 @@ if not BEDROCK_MODEL_ID:
 print(f"[boot] AWS_REGION={AWS_REGION}")
 print(f"[boot] BEDROCK_MODEL_ID={BEDROCK_MODEL_ID}")
 
-bedrock = boto3.client("bedrock-runtime", region_name=AWS_REGION)
+# Bounded timeouts / retries: a degraded Bedrock must not hold request threads for minutes.
+# Worst case is about connect + read_timeout * max_attempts (3 + 25 * 2 = 53s), which has to
+# stay under the CloudFront origin read timeout (60s) so the client gets our 502, not a 504.
+bedrock = boto3.client(
+    "bedrock-runtime",
+    region_name=AWS_REGION,
+    config=Config(
+        connect_timeout=float(os.getenv("BEDROCK_CONNECT_TIMEOUT", "3")),
+        read_timeout=float(os.getenv("BEDROCK_READ_TIMEOUT", "25")),
+        retries={"max_attempts": int(os.getenv("BEDROCK_MAX_ATTEMPTS", "2")), "mode": "standard"},
+    ),
+)
+
+# Errors that mean "Bedrock is unhealthy" (as opposed to "this request is bad")
+BEDROCK_OUTAGE_CODES = {
+    "ThrottlingException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelTimeoutException",
+    "ModelNotReadyException",
+}
+
+DEGRADED_ANSWER = "The AI service is temporarily unavailable. Please try again in a moment."
+
 
+def is_bedrock_outage(e: Exception) -> bool:
+    if isinstance(e, ClientError):
+        code = e.response.get("Error", {}).get("Code", "")
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return code in BEDROCK_OUTAGE_CODES or status == 429 or status >= 500
+    if isinstance(e, ParamValidationError):
+        # malformed request built on our side: not Bedrock's fault
+        return False
+    # timeouts, connection errors, credential lookup failures
+    return isinstance(e, (BotoCoreError, TimeoutError, ConnectionError))
+
+
+breakers = BreakerRegistry(
+    failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+    open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "30")),
+    is_failure=is_bedrock_outage,
+)
 
-def ask_bedrock(message: str) -> str:
+
+def ask_bedrock(message: str, usage: dict = None):
     """
     - Titan Text Express: use InvokeModel with Titan schema
     - Others (Claude/Nova/...): use Converse API
+    Input is fitted to the model's token budget and maxTokens is sized per question
+    (see token_budget.py); actual usage is fed back to calibrate the estimator.
+
+    Returns (answer, usage). usage (token counts, stage latencies for the ledger) is filled
+    in place, so a caller-provided dict keeps plan_ms / bedrock_ms even when the call fails.
     """
+    usage = {} if usage is None else usage
     mid = BEDROCK_MODEL_ID.strip()
+    t0 = time.perf_counter()
+    plan = token_budget.plan_request(mid, message)
+    if plan["truncated"]:
+        print(f"[tokens] input truncated to ~{plan['input_tokens']} tokens")
+    t_plan = time.perf_counter()
+
+    usage.update({
+        "model_id": mid,
+        "estimated_input_tokens": plan["input_tokens"],
+        "max_tokens": plan["max_tokens"],
+        "question_type": plan["question_type"],
+        "truncated": plan["truncated"],
+        "plan_ms": round((t_plan - t0) * 1000, 2),
+    })
+    try:
+        return _invoke_model(mid, plan, usage), usage
+    finally:
+        usage["bedrock_ms"] = round((time.perf_counter() - t_plan) * 1000, 2)
+
 
+def _invoke_model(mid: str, plan: dict, usage: dict) -> str:
     # 1) Titan path (most robust)
     if mid == "amazon.titan-text-express-v1" or mid.endswith("amazon.titan-text-express-v1"):
         body = {
-            "inputText": message,
+            "inputText": plan["text"],
             "textGenerationConfig": {
-                "maxTokenCount": 256,
+                "maxTokenCount": plan["max_tokens"],
                 "temperature": 0.5,
                 "topP": 0.9,
             },
@@ -57,6 +188,9 @@ def ask_bedrock(message: str) -> str:
         result = json.loads(resp["body"].read())
         # Titan response shape
         outputs = result.get("results", [])
+        usage["input_tokens"] = result.get("inputTextTokenCount")
+        usage["output_tokens"] = outputs[0].get("tokenCount") if outputs else None
+        token_budget.record_usage(mid, plan["input_tokens"], usage["input_tokens"], usage["output_tokens"])
         if outputs and "outputText" in outputs[0]:
             return outputs[0]["outputText"].strip()
         return json.dumps(result)  # fallback for debugging
@@ -64,36 +198,116 @@ def ask_bedrock(message: str) -> str:
     # 2) Converse path (Claude/Nova etc.)
     resp = bedrock.converse(
         modelId=mid,
-        messages=[{"role": "user", "content": [{"text": message}]}],
-        inferenceConfig={"maxTokens": 256, "temperature": 0.5, "topP": 0.9},
+        messages=[{"role": "user", "content": [{"text": plan["text"]}]}],
+        inferenceConfig={"maxTokens": plan["max_tokens"], "temperature": 0.5, "topP": 0.9},
     )
+    usage["input_tokens"] = (resp.get("usage") or {}).get("inputTokens")
+    usage["output_tokens"] = (resp.get("usage") or {}).get("outputTokens")
+    token_budget.record_usage(mid, plan["input_tokens"], usage["input_tokens"], usage["output_tokens"])
     return resp["output"]["message"]["content"][0]["text"].strip()
 
 
-@app.get("/health")
+def _health():
+    # Liveness stays 200 while degraded: restarting tasks does not fix Bedrock
+    degraded = breakers.degraded()
+    return {"status": "degraded" if degraded else "ok", "bedrock": breakers.snapshot()}
+
+
+def _ready():
+    body = _health()
+    status_code = 503 if body["status"] == "degraded" else 200
+    return ORJSONResponse(status_code=status_code, content=body)
+
+
+@app.get("/health", response_model=HealthResponse)
 def health():
-    return {"status": "ok"}
+    return _health()
 
 
-@app.get("/api/health")
+@app.get("/api/health", response_model=HealthResponse)
 def api_health():
-    return {"status": "ok"}
+    return _health()
+
+
+@app.get("/ready", response_model=HealthResponse, responses={503: {"model": HealthResponse}})
+def ready():
+    return _ready()
+
 
+@app.get("/api/ready", response_model=HealthResponse, responses={503: {"model": HealthResponse}})
+def api_ready():
+    return _ready()
 
-@app.post("/api/chat")
-def chat(payload: dict):
-    message = ((payload.get("message") or "").strip() or (payload.get("question") or "").strip())
+
+def degraded_response(request_id: str, message: str, mid: str, t0: float, error: CircuitOpenError):
+    """Circuit open: last-known-good answer if we have one, else a canned 503. No Bedrock call."""
+    cached = answer_cache.get(mid, message)
+    source = "stale" if cached else "canned"
+    status_code = 200 if cached else 503
+    ledger.record(
+        request_id=request_id,
+        model_id=mid,
+        cache_source=source,
+        status=status_code,
+        error=type(error).__name__,
+        total_ms=round((time.perf_counter() - t0) * 1000, 2),
+    )
+    return ORJSONResponse(
+        status_code=status_code,
+        content={"question": message, "answer": cached[0] if cached else DEGRADED_ANSWER, "degraded": True},
+        headers={"Retry-After": str(max(1, int(error.retry_after)))},
+    )
+
+
+@app.post(
+    "/api/chat",
+    response_model=ChatResponse,
+    responses={
+        422: {"description": "Empty or oversized message"},
+        502: {"model": ErrorResponse},
+        503: {"model": ChatResponse, "description": "Bedrock degraded (circuit open), canned answer"},
+    },
+)
+def chat(payload: ChatRequest):
+    t0 = time.perf_counter()
+    request_id = uuid.uuid4().hex
+    message = payload.message
 
     if message.lower() in {"what time is it?", "what time is it"}:
         now = datetime.now(timezone.utc).isoformat()
+        ledger.record(
+            request_id=request_id,
+            model_id=None,
+            cache_source="deterministic",
+            status=200,
+            total_ms=round((time.perf_counter() - t0) * 1000, 2),
+        )
         return {"question": message, "answer": f"Current UTC time is {now}"}
 
-    if not message:
-        return {"question": "", "answer": "Please provide a message."}
-
+    mid = BEDROCK_MODEL_ID.strip()
+    # filled by ask_bedrock even on failure, so slow / failed calls keep their timings
+    usage = {"model_id": mid}
     try:
-        answer = ask_bedrock(message)
+        answer, _ = breakers.get(mid).call(ask_bedrock, message, usage)
+    except CircuitOpenError as e:
+        return degraded_response(request_id, message, mid, t0, e)
     except Exception as e:
-        answer = f"[bedrock_error] {type(e).__name__}: {str(e)}"
+        ledger.record(
+            request_id=request_id,
+            cache_source="none",
+            status=502,
+            error=type(e).__name__,
+            total_ms=round((time.perf_counter() - t0) * 1000, 2),
+            **usage,
+        )
+        raise HTTPException(status_code=502, detail=f"[bedrock_error] {type(e).__name__}: {str(e)}")
 
+    ledger.record(
+        request_id=request_id,
+        cache_source="none",
+        status=200,
+        total_ms=round((time.perf_counter() - t0) * 1000, 2),
+        **usage,
+    )
+    answer_cache.put(mid, message, answer)
     return {"question": message, "answer": answer}
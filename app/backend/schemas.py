@@ -0,0 +1,44 @@
+import os
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+# Hard cap on user input: rejects huge prompts before they reach Bedrock
+MAX_MESSAGE_CHARS = int(os.getenv("MAX_MESSAGE_CHARS", "4000"))
+
+
+class ChatRequest(BaseModel):
+    """
+    POST /api/chat body.
+    `message` is the canonical field; `question` is still accepted for older clients.
+    """
+
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+
+    message: Optional[str] = Field(default=None, max_length=MAX_MESSAGE_CHARS)
+    question: Optional[str] = Field(default=None, max_length=MAX_MESSAGE_CHARS)
+
+    @model_validator(mode="after")
+    def _require_text(self):
+        text = self.message or self.question
+        if not text:
+            raise ValueError("Please provide a message.")
+        self.message = text
+        return self
+
+
+class ChatResponse(BaseModel):
+    question: str
+    answer: str
+    # True when served without Bedrock (stale cached answer or canned text)
+    degraded: bool = False
+
+
+class HealthResponse(BaseModel):
+    status: str
+    # per-model circuit breaker state
+    bedrock: Optional[dict] = None
+
+
+class ErrorResponse(BaseModel):
+    detail: str
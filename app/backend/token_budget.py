@@ -0,0 +1,247 @@
+"""
+Token accounting for Bedrock calls.
+
+- Estimate input tokens before the call (pluggable per-model tokenizers, fast approximate default)
+- Truncate / compress input to a per-model context budget
+- Pick maxTokens from the question type and the remaining budget
+- Record estimated vs actual usage (from the response) to calibrate the estimator
+"""
+import os
+import re
+import threading
+
+# -----------------------------
+# Model limits
+# -----------------------------
+# context: total window (input + output), max_output: model hard cap on generated tokens
+MODEL_LIMITS = {
+    "amazon.titan-text-express-v1": {"context": 8192, "max_output": 8192},
+    "amazon.titan-text-lite-v1": {"context": 4096, "max_output": 4096},
+    "amazon.nova-micro-v1": {"context": 128000, "max_output": 5120},
+    "amazon.nova-lite-v1": {"context": 300000, "max_output": 5120},
+    "amazon.nova-pro-v1": {"context": 300000, "max_output": 5120},
+    "anthropic.claude-3-haiku": {"context": 200000, "max_output": 4096},
+    "anthropic.claude-3-5-haiku": {"context": 200000, "max_output": 8192},
+}
+DEFAULT_LIMITS = {"context": 4096, "max_output": 512}
+
+# Input cap independent of the model window (cost / latency guard)
+INPUT_TOKEN_BUDGET = int(os.getenv("INPUT_TOKEN_BUDGET", "2000"))
+# Output cap independent of the model (cost / latency guard)
+OUTPUT_TOKEN_CAP = int(os.getenv("OUTPUT_TOKEN_CAP", "1024"))
+MIN_OUTPUT_TOKENS = 64
+
+TRUNCATION_MARKER = "\n...\n"
+
+
+def model_key(model_id: str) -> str:
+    """
+    Normalize model id / inference profile ARN to a MODEL_LIMITS key.
+    e.g. arn:...:inference-profile/apac.amazon.nova-micro-v1:0 -> amazon.nova-micro-v1
+    """
+    mid = model_id.strip().rsplit("/", 1)[-1]
+    mid = re.sub(r":\d+$", "", mid)
+    for key in MODEL_LIMITS:
+        if key in mid:
+            return key
+    return mid
+
+
+def limits_for(model_id: str) -> dict:
+    return MODEL_LIMITS.get(model_key(model_id), DEFAULT_LIMITS)
+
+
+# -----------------------------
+# Tokenizers
+# -----------------------------
+_WORD_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def approx_tokens(text: str) -> int:
+    """
+    Fast approximation (no vocab): ~1 token per CJK char, ~1 per 4 latin chars of a word,
+    1 per digit group / punctuation. Within ~15% of BPE tokenizers on mixed zh/en text.
+    """
+    if not text:
+        return 0
+    count = 0
+    for tok in _WORD_RE.findall(text):
+        if tok.isascii() and tok.isalpha():
+            count += max(1, (len(tok) + 3) // 4)
+        elif tok.isdigit():
+            count += max(1, (len(tok) + 2) // 3)
+        else:
+            # single CJK char / punctuation / other symbol
+            count += 1
+    return count
+
+
+# model key -> tokenizer(text) -> int; models without an entry use approx_tokens
+TOKENIZERS = {}
+
+
+def register_tokenizer(model: str, tokenizer):
+    """Plug in an exact tokenizer for a model (key as in MODEL_LIMITS)."""
+    TOKENIZERS[model_key(model)] = tokenizer
+
+
+def tokenizer_for(model_id: str):
+    return TOKENIZERS.get(model_key(model_id), approx_tokens)
+
+
+# -----------------------------
+# Calibration (estimated vs actual)
+# -----------------------------
+_CALIBRATION_ALPHA = 0.1
+# Actual input tokens include a fixed per-call overhead (chat template / role tokens);
+# on short prompts that overhead dominates and would be mistaken for a multiplier
+MIN_CALIBRATION_TOKENS = int(os.getenv("MIN_CALIBRATION_TOKENS", "200"))
+# Keep one bad sample from swinging estimates (and truncation) too far
+CALIBRATION_BOUNDS = (0.5, 2.0)
+_calibration = {}  # model key -> {"ratio": actual/estimated (EWMA), "samples": n}
+_calibration_lock = threading.Lock()
+
+
+def calibration_ratio(model_id: str) -> float:
+    entry = _calibration.get(model_key(model_id))
+    return entry["ratio"] if entry else 1.0
+
+
+def calibration_snapshot() -> dict:
+    with _calibration_lock:
+        return {k: dict(v) for k, v in _calibration.items()}
+
+
+def estimate_tokens(model_id: str, text: str) -> int:
+    raw = tokenizer_for(model_id)(text)
+    # exact tokenizers need no correction
+    if model_key(model_id) in TOKENIZERS:
+        return raw
+    return int(round(raw * calibration_ratio(model_id)))
+
+
+def record_usage(model_id: str, estimated_input: int, actual_input, actual_output=None) -> dict:
+    """
+    Feed the actual input token count back into the estimator.
+    `estimated_input` must be the calibrated estimate used for the call.
+    Samples below MIN_CALIBRATION_TOKENS are logged but do not move the ratio.
+    """
+    key = model_key(model_id)
+    if not actual_input or not estimated_input:
+        return {}
+    with _calibration_lock:
+        entry = _calibration.setdefault(key, {"ratio": 1.0, "samples": 0})
+        if actual_input >= MIN_CALIBRATION_TOKENS:
+            # estimate was already multiplied by the current ratio -> correct relative to it
+            observed = entry["ratio"] * actual_input / estimated_input
+            ratio = (1 - _CALIBRATION_ALPHA) * entry["ratio"] + _CALIBRATION_ALPHA * observed
+            entry["ratio"] = min(max(ratio, CALIBRATION_BOUNDS[0]), CALIBRATION_BOUNDS[1])
+            entry["samples"] += 1
+        ratio = entry["ratio"]
+
+    print(
+        f"[tokens] model={key} est_in={estimated_input} actual_in={actual_input} "
+        f"actual_out={actual_output} ratio={ratio:.3f}"
+    )
+    return {"model": key, "ratio": ratio}
+
+
+# -----------------------------
+# Truncation / compression
+# -----------------------------
+_WS_RE = re.compile(r"[ \t]+")
+_NL_RE = re.compile(r"\n{3,}")
+
+
+def compress_text(text: str) -> str:
+    """Lossless-enough whitespace squeeze (tokens spent on layout carry no meaning)."""
+    text = _WS_RE.sub(" ", text)
+    text = _NL_RE.sub("\n\n", text)
+    return "\n".join(line.strip() for line in text.splitlines()).strip()
+
+
+def truncate_to_budget(model_id: str, text: str, budget: int):
+    """
+    Fit text into `budget` tokens: compress whitespace first, then keep head + tail
+    (questions usually sit at the end, context at the start) and drop the middle.
+    Returns (text, estimated_tokens, truncated).
+    """
+    tokens = estimate_tokens(model_id, text)
+    if tokens <= budget:
+        return text, tokens, False
+
+    text = compress_text(text)
+    tokens = estimate_tokens(model_id, text)
+    if tokens <= budget:
+        return text, tokens, True
+
+    # binary search on kept characters (head 1/3, tail 2/3)
+    lo, hi = 0, len(text)
+    best = ""
+    while lo <= hi:
+        keep = (lo + hi) // 2
+        head = keep // 3
+        candidate = text[:head] + TRUNCATION_MARKER + text[len(text) - (keep - head):]
+        if estimate_tokens(model_id, candidate) <= budget:
+            best = candidate
+            lo = keep + 1
+        else:
+            hi = keep - 1
+
+    return best, estimate_tokens(model_id, best), True
+
+
+# -----------------------------
+# Output budget
+# -----------------------------
+_SHORT_RE = re.compile(
+    r"^\s*(what time|what day|what date|who is|who was|when is|when was|when did|where is|how (many|much|old))\b",
+    re.IGNORECASE,
+)
+_LONG_RE = re.compile(
+    r"\b(explain|describe|compare|summari[sz]e|write|list|steps?|example|code|implement|why|how to|in detail)\b"
+    r"|解釋|說明|比較|總結|撰寫|列出|步驟|範例|為什麼|如何",
+    re.IGNORECASE,
+)
+
+# question type -> desired output tokens (never below the old fixed 256)
+OUTPUT_TOKENS_BY_TYPE = {
+    "short": 256,
+    "default": 512,
+    "long": 1024,
+}
+
+
+def classify_question(text: str) -> str:
+    if _LONG_RE.search(text):
+        return "long"
+    if len(text) <= 60 and _SHORT_RE.search(text):
+        return "short"
+    return "default"
+
+
+def plan_request(model_id: str, message: str) -> dict:
+    """
+    Decide what to send for one call.
+
+    Returns:
+      text, input_tokens (estimate), max_tokens, question_type, truncated
+    """
+    limits = limits_for(model_id)
+    qtype = classify_question(message)
+    want_output = min(OUTPUT_TOKENS_BY_TYPE[qtype], limits["max_output"], OUTPUT_TOKEN_CAP)
+
+    # keep room for the answer inside the context window
+    input_budget = min(INPUT_TOKEN_BUDGET, limits["context"] - max(want_output, MIN_OUTPUT_TOKENS))
+    text, input_tokens, truncated = truncate_to_budget(model_id, message, input_budget)
+
+    remaining = limits["context"] - input_tokens
+    max_tokens = max(MIN_OUTPUT_TOKENS, min(want_output, remaining))
+
+    return {
+        "text": text,
+        "input_tokens": input_tokens,
+        "max_tokens": max_tokens,
+        "question_type": qtype,
+        "truncated": truncated,
+    }
@@ -0,0 +1,142 @@
+"""
+Fault-injection scenario for the Bedrock circuit breaker (no AWS needed).
+
+  cd app/backend
+  python tools/chaos_bedrock.py
+
+Swaps the real bedrock-runtime client for FakeBedrock and drives /api/chat
+through a full outage cycle:
+  healthy -> outage (breaker opens) -> degraded (stale / canned, fast)
+  -> half-open probe fails -> recovery (probe succeeds, breaker closes)
+
+Each step is checked; exits non-zero on the first mismatch.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("BEDROCK_MODEL_ID", "apac.amazon.nova-micro-v1:0")
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-1")
+os.environ.setdefault("CIRCUIT_FAILURE_THRESHOLD", "3")
+os.environ.setdefault("CIRCUIT_OPEN_SECONDS", "1")
+os.environ.setdefault("USAGE_LEDGER_DIR", "/tmp/usage-ledger-chaos")
+
+from botocore.exceptions import ClientError, ReadTimeoutError  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+OPEN_SECONDS = float(os.environ["CIRCUIT_OPEN_SECONDS"])
+THRESHOLD = int(os.environ["CIRCUIT_FAILURE_THRESHOLD"])
+
+
+class FakeBedrock:
+    """
+    Stand-in for the bedrock-runtime client.
+      mode="ok"       -> normal Converse response
+      mode="unavail"  -> ServiceUnavailableException after `latency`
+      mode="timeout"  -> ReadTimeoutError after `latency`
+      mode="invalid"  -> ValidationException (bad request, must not trip the breaker)
+    """
+
+    def __init__(self):
+        self.mode = "ok"
+        self.latency = 0.0
+        self.calls = 0
+
+    def converse(self, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.mode == "unavail":
+            raise ClientError(
+                {"Error": {"Code": "ServiceUnavailableException", "Message": "injected"},
+                 "ResponseMetadata": {"HTTPStatusCode": 503}},
+                "Converse",
+            )
+        if self.mode == "timeout":
+            raise ReadTimeoutError(endpoint_url="https://bedrock-runtime.fake")
+        if self.mode == "invalid":
+            raise ClientError(
+                {"Error": {"Code": "ValidationException", "Message": "injected"},
+                 "ResponseMetadata": {"HTTPStatusCode": 400}},
+                "Converse",
+            )
+        text = kwargs["messages"][0]["content"][0]["text"]
+        return {
+            "output": {"message": {"content": [{"text": f"answer to: {text}"}]}},
+            "usage": {"inputTokens": 10, "outputTokens": 5},
+        }
+
+
+def check(label: str, cond: bool, detail=""):
+    print(f"[{'ok' if cond else 'FAIL'}] {label} {detail}")
+    if not cond:
+        sys.exit(1)
+
+
+def post(client, message):
+    t0 = time.perf_counter()
+    r = client.post("/api/chat", json={"message": message})
+    return r, (time.perf_counter() - t0) * 1000
+
+
+def main_scenario():
+    fake = FakeBedrock()
+    main.bedrock = fake
+    state = lambda: main.breakers.get(main.BEDROCK_MODEL_ID.strip()).state  # noqa: E731
+
+    with TestClient(main.app) as client:
+        # 1) healthy: fills the last-known-good cache
+        r, _ = post(client, "Tell me a short joke.")
+        check("healthy answer", r.status_code == 200 and not r.json()["degraded"])
+        check("ready while healthy", client.get("/api/ready").status_code == 200)
+
+        # 2) bad input does not count as an outage
+        fake.mode = "invalid"
+        for _ in range(THRESHOLD + 1):
+            r, _ = post(client, "bad request")
+        check("validation errors keep circuit closed", state() == "closed", f"status={r.status_code}")
+
+        # 3) outage: threshold failures open the circuit
+        fake.mode, fake.latency = "timeout", 0.2
+        for _ in range(THRESHOLD):
+            r, ms = post(client, "Explain CDN caching")
+        check("outage surfaces as 502 before opening", r.status_code == 502, f"{ms:.0f}ms")
+        check("circuit open after threshold", state() == "open")
+
+        # 4) degraded: no Bedrock call, millisecond responses
+        calls = fake.calls
+        r, ms = post(client, "tell me a short joke")
+        check("stale answer served", r.status_code == 200 and r.json()["degraded"], f"{ms:.1f}ms")
+        r, ms = post(client, "Something never asked before")
+        check("canned 503 served", r.status_code == 503 and r.json()["degraded"], f"{ms:.1f}ms")
+        check("Retry-After header", "retry-after" in r.headers, r.headers.get("retry-after", ""))
+        check("fast-fail skips Bedrock", fake.calls == calls)
+        check("degraded responses fast", ms < 50, f"{ms:.1f}ms")
+
+        health = client.get("/api/health")
+        check("health 200 but degraded", health.status_code == 200 and health.json()["status"] == "degraded")
+        check("ready 503 while degraded", client.get("/api/ready").status_code == 503)
+
+        # 5) half-open probe fails -> open again
+        time.sleep(OPEN_SECONDS)
+        fake.mode, fake.latency = "unavail", 0.0
+        calls = fake.calls
+        post(client, "probe during outage")
+        check("single half-open probe", fake.calls == calls + 1)
+        check("probe failure reopens", state() == "open")
+
+        # 6) recovery
+        time.sleep(OPEN_SECONDS)
+        fake.mode = "ok"
+        r, _ = post(client, "Explain CDN caching")
+        check("probe success closes circuit", r.status_code == 200 and state() == "closed")
+        check("ready again", client.get("/api/ready").status_code == 200)
+
+    print("[chaos] all checks passed")
+
+
+if __name__ == "__main__":
+    main_scenario()
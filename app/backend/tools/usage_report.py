@@ -0,0 +1,254 @@
+"""
+Usage ledger CLI (offline, columnar).
+
+  pip install -r tools/requirements.txt
+
+  # 1) fetch rotated segments (JSONL.gz) from the assets bucket
+  aws s3 sync s3://<assets_bucket>/usage-ledger ./ledger-raw
+
+  # 2) compact into Parquet partitioned by day (dt=YYYY-MM-DD)
+  python tools/usage_report.py compact --src ./ledger-raw --out ./ledger-parquet
+
+  # 3) aggregate p50 / p95 latency, tokens and cost
+  python tools/usage_report.py report --data ./ledger-parquet --by model
+  python tools/usage_report.py report --data ./ledger-parquet --by day --since 2026-10-01
+
+Aggregation runs on Arrow (hash group-by + t-digest), so millions of rows
+stay in columnar memory instead of Python objects.
+"""
+import argparse
+import json
+import os
+import sys
+import uuid
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.json as pj
+except ImportError:
+    sys.exit("pyarrow is required: pip install -r tools/requirements.txt")
+
+SCHEMA = pa.schema([
+    ("ts", pa.string()),
+    ("request_id", pa.string()),
+    ("model_id", pa.string()),
+    ("cache_source", pa.string()),
+    ("status", pa.int32()),
+    ("error", pa.string()),
+    ("question_type", pa.string()),
+    ("truncated", pa.bool_()),
+    ("estimated_input_tokens", pa.int64()),
+    ("input_tokens", pa.int64()),
+    ("output_tokens", pa.int64()),
+    ("max_tokens", pa.int64()),
+    ("plan_ms", pa.float64()),
+    ("bedrock_ms", pa.float64()),
+    ("total_ms", pa.float64()),
+    ("cost_usd", pa.float64()),
+])
+
+GROUP_KEYS = {
+    "model": ["model_id"],
+    "day": ["dt"],
+    "model-day": ["dt", "model_id"],
+    "source": ["cache_source"],
+}
+
+
+def _segment_files(src: str) -> list:
+    files = []
+    for root, _, names in os.walk(src):
+        for name in names:
+            if name.endswith((".jsonl", ".jsonl.gz")):
+                files.append(os.path.join(root, name))
+    return sorted(files)
+
+
+def _valid_lines(data: bytes) -> tuple:
+    good, bad = [], 0
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            json.loads(line)
+        except ValueError:
+            bad += 1
+            continue
+        good.append(line)
+    return good, bad
+
+
+def _read_segment(path: str, parse: pj.ParseOptions):
+    """
+    One segment as a table, or None. A task killed mid-write leaves a truncated last
+    line (shipped as-is on the next rotation); such lines are dropped and logged
+    instead of failing the whole run.
+    """
+    try:
+        with pa.input_stream(path, compression="detect") as f:
+            data = f.read()
+    except (OSError, pa.ArrowInvalid) as e:
+        print(f"[ledger] skipped unreadable segment {path}: {e}")
+        return None
+    if not data.strip():
+        print(f"[ledger] skipped empty segment {path}")
+        return None
+    try:
+        return pj.read_json(pa.BufferReader(data), parse_options=parse)
+    except pa.ArrowInvalid:
+        pass
+
+    good, bad = _valid_lines(data)
+    print(f"[ledger] {path}: dropped {bad} malformed line(s), kept {len(good)}")
+    if not good:
+        return None
+    try:
+        return pj.read_json(pa.BufferReader(b"\n".join(good) + b"\n"), parse_options=parse)
+    except pa.ArrowInvalid as e:
+        print(f"[ledger] skipped segment {path}: {e}")
+        return None
+
+
+def read_segments(src: str) -> pa.Table:
+    parse = pj.ParseOptions(explicit_schema=SCHEMA, unexpected_field_behavior="ignore")
+    tables = []
+    for path in _segment_files(src):
+        table = _read_segment(path, parse)
+        if table is not None:
+            tables.append(table)
+    table = pa.concat_tables(tables) if tables else SCHEMA.empty_table()
+    return table.append_column("dt", pc.utf8_slice_codeunits(table["ts"], 0, 10))
+
+
+def dedupe(table: pa.Table) -> pa.Table:
+    """Keep the first row per request_id (same segment synced twice, .jsonl + .jsonl.gz, ...)."""
+    if table.num_rows == 0:
+        return table
+    indexed = table.append_column("__row", pa.array(range(table.num_rows), pa.int64()))
+    first = indexed.group_by("request_id", use_threads=False).aggregate([("__row", "min")])
+    return table.take(first["__row_min"])
+
+
+def _existing_request_ids(out: str, days: list) -> pa.Array:
+    if not os.path.isdir(out):
+        return pa.array([], pa.string())
+    dataset = ds.dataset(out, format="parquet", partitioning="hive")
+    if "dt" not in dataset.schema.names:
+        return pa.array([], pa.string())  # nothing compacted yet (empty --out)
+    return dataset.to_table(columns=["request_id"], filter=ds.field("dt").isin(days))["request_id"]
+
+
+def compact(src: str, out: str) -> int:
+    """
+    Append new rows to the Parquet dataset. Existing partitions are never rewritten:
+    each run writes uniquely named files and skips request_ids already compacted,
+    so re-running on a partial or overlapping download is safe.
+    """
+    table = dedupe(read_segments(src))
+    if table.num_rows == 0:
+        print(f"[ledger] no segments under {src}")
+        return 0
+
+    days = pc.unique(table["dt"]).to_pylist()
+    seen = _existing_request_ids(out, days)
+    new_rows = table.filter(pc.invert(pc.is_in(table["request_id"], value_set=seen)))
+    if new_rows.num_rows == 0:
+        print(f"[ledger] nothing new ({table.num_rows} rows already compacted)")
+        return 0
+
+    ds.write_dataset(
+        new_rows,
+        out,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("dt", pa.string())]), flavor="hive"),
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    print(f"[ledger] compacted {new_rows.num_rows} new rows "
+          f"({table.num_rows - new_rows.num_rows} already present) -> {out}")
+    return new_rows.num_rows
+
+
+def load(data: str, since: str = None, until: str = None) -> pa.Table:
+    if _segment_files(data):
+        table = read_segments(data)
+        dataset = ds.dataset(table)
+    else:
+        dataset = ds.dataset(data, format="parquet", partitioning="hive")
+
+    expr = None
+    if since:
+        expr = ds.field("dt") >= since
+    if until:
+        cond = ds.field("dt") <= until
+        expr = cond if expr is None else expr & cond
+    # partition pruning: only matching dt=... directories are read
+    return dataset.to_table(filter=expr)
+
+
+def aggregate(table: pa.Table, by: str) -> pa.Table:
+    keys = GROUP_KEYS[by]
+    q = pc.TDigestOptions(q=[0.5, 0.95])
+    result = table.group_by(keys).aggregate([
+        ("request_id", "count"),
+        ("total_ms", "tdigest", q),
+        ("bedrock_ms", "tdigest", q),
+        ("input_tokens", "sum"),
+        ("output_tokens", "sum"),
+        ("cost_usd", "sum"),
+    ])
+    return result.sort_by([(k, "ascending") for k in keys])
+
+
+def _fmt_q(values, i):
+    if values is None or len(values) <= i or values[i] is None:
+        return "-"
+    return f"{values[i]:.1f}"
+
+
+def print_report(result: pa.Table, by: str):
+    keys = GROUP_KEYS[by]
+    header = [*keys, "requests", "p50 ms", "p95 ms", "bedrock p95", "in tok", "out tok", "cost USD"]
+    print("\t".join(header))
+    for row in result.to_pylist():
+        print("\t".join([
+            *[str(row[k]) for k in keys],
+            str(row["request_id_count"]),
+            _fmt_q(row["total_ms_tdigest"], 0),
+            _fmt_q(row["total_ms_tdigest"], 1),
+            _fmt_q(row["bedrock_ms_tdigest"], 1),
+            str(row["input_tokens_sum"] or 0),
+            str(row["output_tokens_sum"] or 0),
+            f"{row['cost_usd_sum'] or 0:.6f}",
+        ]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate the usage ledger (cost / latency)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_compact = sub.add_parser("compact", help="JSONL(.gz) segments -> Parquet partitioned by dt")
+    p_compact.add_argument("--src", required=True)
+    p_compact.add_argument("--out", required=True)
+
+    p_report = sub.add_parser("report", help="p50/p95 latency, tokens and cost per group")
+    p_report.add_argument("--data", required=True, help="Parquet dataset (or raw segment dir)")
+    p_report.add_argument("--by", default="model", choices=sorted(GROUP_KEYS))
+    p_report.add_argument("--since", help="YYYY-MM-DD (inclusive)")
+    p_report.add_argument("--until", help="YYYY-MM-DD (inclusive)")
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "compact":
+        compact(args.src, args.out)
+        return 0
+
+    table = load(args.data, args.since, args.until)
+    print_report(aggregate(table, args.by), args.by)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Per-request usage ledger (cost / latency accounting).
+
+Each /api/chat request produces one record:
+  ts, request_id, model_id, input_tokens, output_tokens, estimated_input_tokens,
+  cache_source, status, latency breakdown (ms), estimated cost (USD)
+
+Write path (never blocks the request):
+  record() -> bounded queue -> background thread -> batched append to a local JSONL segment
+  -> segment rotates (on the hour, even when idle / size) -> gzip upload to the assets bucket
+     s3://<bucket>/usage-ledger/dt=YYYY-MM-DD/<YYYY-MM-DD-HH>-<host>-<ms>.jsonl.gz
+  Segments that fail to upload are retried at every rotation (local disk does not outlive
+  a Fargate task, so retrying at the next start would lose them), and stay local up to
+  LOCAL_MAX_BYTES (oldest evicted first). Dropped records / evicted segments are logged.
+
+Aggregation (p50/p95, cost per model / day) is offline: tools/usage_report.py
+"""
+import gzip
+import json
+import os
+import queue
+import shutil
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+
+import token_budget
+
+LEDGER_DIR = os.getenv("USAGE_LEDGER_DIR", "/tmp/usage-ledger")
+LEDGER_BUCKET = os.getenv("USAGE_LEDGER_BUCKET")  # unset -> segments stay local
+LEDGER_PREFIX = os.getenv("USAGE_LEDGER_PREFIX", "usage-ledger")
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_LEDGER_FLUSH_SECONDS", "2"))
+FLUSH_BATCH_SIZE = 200
+ROTATE_BYTES = int(os.getenv("USAGE_LEDGER_ROTATE_BYTES", str(16 * 1024 * 1024)))
+# Closed segments kept on local disk (no bucket / uploads failing); oldest are evicted first
+LOCAL_MAX_BYTES = int(os.getenv("USAGE_LEDGER_LOCAL_MAX_BYTES", str(256 * 1024 * 1024)))
+QUEUE_MAX = 10000
+
+# USD per 1K tokens (on-demand, input / output); keyed by token_budget.model_key()
+PRICING_PER_1K = {
+    "amazon.titan-text-express-v1": (0.0002, 0.0006),
+    "amazon.titan-text-lite-v1": (0.00015, 0.0002),
+    "amazon.nova-micro-v1": (0.000035, 0.00014),
+    "amazon.nova-lite-v1": (0.00006, 0.00024),
+    "amazon.nova-pro-v1": (0.0008, 0.0032),
+    "anthropic.claude-3-haiku": (0.00025, 0.00125),
+    "anthropic.claude-3-5-haiku": (0.0008, 0.004),
+}
+
+
+def estimate_cost(model_id: str, input_tokens, output_tokens) -> float:
+    price = PRICING_PER_1K.get(token_budget.model_key(model_id or ""))
+    if not price:
+        return 0.0
+    return round(((input_tokens or 0) * price[0] + (output_tokens or 0) * price[1]) / 1000, 8)
+
+
+class UsageLedger:
+    def __init__(self, directory: str = LEDGER_DIR, bucket: str = LEDGER_BUCKET):
+        self.directory = directory
+        self.bucket = bucket
+        self.host = socket.gethostname()
+        self.dropped = 0
+        self.evicted_segments = 0
+        self._reported = (0, 0)
+        self._queue = queue.Queue(maxsize=QUEUE_MAX)
+        self._stop = threading.Event()
+        self._thread = None
+        self._segment = None  # (path, hour key)
+        self._hour = None  # hour of the last rotation check
+        self._s3 = None
+
+    # -----------------------------
+    # request path
+    # -----------------------------
+    def record(self, **fields):
+        """Enqueue one record; drops (and counts) when the writer is behind."""
+        fields.setdefault("ts", datetime.now(timezone.utc).isoformat())
+        fields.setdefault(
+            "cost_usd",
+            estimate_cost(fields.get("model_id"), fields.get("input_tokens"), fields.get("output_tokens")),
+        )
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+
+    # -----------------------------
+    # lifecycle
+    # -----------------------------
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # segments left behind by a previous run (same container restarted in place)
+        self._hour = self._current_hour()
+        self._ship_pending()
+        self._enforce_retention()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-ledger", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self._rotate()
+
+    # -----------------------------
+    # writer thread
+    # -----------------------------
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = []
+            deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+            while len(batch) < FLUSH_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                # runs every FLUSH_INTERVAL_SECONDS even without traffic
+                self._rotate_if_due()
+                if batch:
+                    self._write(batch)
+            except Exception as e:
+                print(f"[ledger] write failed: {type(e).__name__}: {e}")
+
+    @staticmethod
+    def _current_hour() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d-%H")
+
+    def _rotate_if_due(self):
+        hour = self._current_hour()
+        if hour != self._hour:
+            # hour boundary: close the segment (if any) and retry failed uploads
+            self._hour = hour
+            self._rotate()
+        elif self._segment and os.path.getsize(self._segment[0]) >= ROTATE_BYTES:
+            self._rotate()
+
+    def _write(self, batch: list):
+        if not self._segment:
+            hour = self._current_hour()
+            path = os.path.join(self.directory, f"{hour}-{self.host}-{int(time.time() * 1000)}.jsonl")
+            self._segment = (path, hour)
+
+        lines = "".join(json.dumps(r, separators=(",", ":"), ensure_ascii=False) + "\n" for r in batch)
+        with open(self._segment[0], "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _rotate(self):
+        """Close the open segment, then ship every closed segment (including earlier failures)."""
+        self._segment = None
+        self._ship_pending()
+        self._enforce_retention()
+        self._report_losses()
+
+    def _ship_pending(self):
+        open_path = self._segment[0] if self._segment else None
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".jsonl") and path != open_path:
+                self._ship(path)
+
+    def _enforce_retention(self):
+        """Cap closed segments left on disk; the open segment is never touched."""
+        open_path = self._segment[0] if self._segment else None
+        segments = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".jsonl") and path != open_path:
+                segments.append((os.path.getmtime(path), os.path.getsize(path), path))
+        total = sum(size for _, size, _ in segments)
+        for _, size, path in sorted(segments):
+            if total <= LOCAL_MAX_BYTES:
+                break
+            os.remove(path)
+            total -= size
+            self.evicted_segments += 1
+            print(f"[ledger] local retention cap reached, evicted {path}")
+
+    def _report_losses(self):
+        current = (self.dropped, self.evicted_segments)
+        if current != self._reported:
+            print(f"[ledger] dropped_records={self.dropped} evicted_segments={self.evicted_segments}")
+            self._reported = current
+
+    def _ship(self, path: str):
+        """gzip a closed segment and upload it; keep it locally if the upload fails."""
+        if not self.bucket:
+            return
+        name = os.path.basename(path)
+        day = name[:10]  # YYYY-MM-DD prefix of the segment name
+        gz_path = path + ".gz"
+        try:
+            with open(path, "rb") as src, gzip.open(gz_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            if self._s3 is None:
+                import boto3
+
+                self._s3 = boto3.client("s3")
+            key = f"{LEDGER_PREFIX}/dt={day}/{name}.gz"
+            self._s3.upload_file(gz_path, self.bucket, key)
+            os.remove(path)
+            print(f"[ledger] rotated -> s3://{self.bucket}/{key}")
+        except Exception as e:
+            print(f"[ledger] upload failed (kept {path}): {type(e).__name__}: {e}")
+        finally:
+            if os.path.exists(gz_path):
+                os.remove(gz_path)
+
+
+ledger = UsageLedger()
@@ -38,9 +38,11 @@ pulumi.export("ecr_repo_name", app_repo.name)
 pulumi.export("ecr_repo_url", ecr_repo_url)
 
 
-phase2 = deploy_phase2(ecr_repo_url)
+phase2 = deploy_phase2(ecr_repo_url, assets_bucket.bucket)
 # Phase 2 outputs (existing resources, NOT creating new ones)
-alb_dns_name = phase2["alb_dns_name"]   # ALB DNS (used by CloudFront origin)
+alb_dns_name = phase2["alb_dns_name"]   # ALB DNS
+alb_origin_domain = phase2["alb_origin_domain"]  # CloudFront origin (custom domain if HTTPS)
+alb_https = phase2["alb_https"]         # ALB has an HTTPS listener
 lb = phase2["lb"]                       # Application Load Balancer
 tg = phase2["tg"]                       # Target Group (ALB -> ECS)
 cluster = phase2["cluster"]             # ECS Cluster
@@ -145,6 +147,6 @@ build_phase4_cloudfront_s3_frontend(
     project=project,
     stack=stack,
     common_tags=common_tags,
-    alb_dns_name=alb_dns_name,
-    frontend_dir="../frontend",
+    alb_dns_name=alb_origin_domain,
+    alb_https=alb_https,
 )
\ No newline at end of file
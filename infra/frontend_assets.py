@@ -0,0 +1,444 @@
+"""
+Frontend asset pipeline (Phase 4 / Phase 6.8).
+
+- Fingerprint assets linked from HTML / CSS (app.js -> app.<hash>.js) and rewrite
+  src / href / srcset / url() / @import; everything else keeps its name
+- Cache-Control: hashed assets are immutable, stable keys stay short-lived at the edge
+- Pre-compress text assets with gzip (S3 cannot negotiate Accept-Encoding, so no brotli)
+- Diff against the manifest of the previous deploy -> upload only changed objects (parallel)
+- CloudFront invalidation only for changed non-fingerprinted paths
+- --prune keeps the previous release's assets for one more release (open tabs / cached HTML)
+
+Used by CI/CD, the only writer of the frontend bucket (Pulumi creates the bucket, not objects):
+  python infra/frontend_assets.py deploy --bucket ... --distribution-id ...
+
+Diff can be checked locally without AWS:
+  python infra/frontend_assets.py plan --src frontend --remote-manifest old-manifest.json
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_KEY = ".asset-manifest.json"
+
+# Hashed file names never change content -> cache forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Stable keys (HTML and anything not fingerprinted): browser always revalidates,
+# edge keeps it briefly (changed stable keys are invalidated on deploy)
+STABLE_CACHE_CONTROL = "public, max-age=0, s-maxage=300, must-revalidate"
+
+# Files that must keep their name even when linked (fetched by convention / from outside)
+UNHASHED_FILES = {"robots.txt", "favicon.ico", "manifest.json"}
+
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+    "text/javascript",
+}
+COMPRESS_MIN_BYTES = 1024
+
+HASH_LEN = 10
+UPLOAD_WORKERS = 8
+
+# HTML: src="..." / href="..." and srcset="a.png 1x, b.png 2x"
+_ATTR_RE = re.compile(r"""\b(?:src|href)=(?P<q>["'])(?P<path>[^"'#?]+)[^"']*(?P=q)""")
+_SRCSET_RE = re.compile(r"""\bsrcset=(?P<q>["'])(?P<value>[^"']*)(?P=q)""")
+# CSS (files and inline styles): url(...) and @import "..."
+_CSS_URL_RE = re.compile(r"""url\(\s*(?P<q>["']?)(?P<path>[^"')?#\s]+)[^"')]*(?P=q)\s*\)""")
+_CSS_IMPORT_RE = re.compile(r"""@import\s+(?P<q>["'])(?P<path>[^"'?#]+)[^"']*(?P=q)""")
+# name.<hash>.ext as produced by _hashed_key
+_HASHED_KEY_RE = re.compile(r"\.[0-9a-f]{%d}(?:\.[^./]+)?$" % HASH_LEN)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _content_type(path: str) -> str:
+    content_type, _ = mimetypes.guess_type(path)
+    return content_type or "application/octet-stream"
+
+
+def _is_html(path: str) -> bool:
+    return path.endswith((".html", ".htm"))
+
+
+def _is_compressible(content_type: str) -> bool:
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+def _is_css(path: str) -> bool:
+    return path.endswith(".css")
+
+
+def _is_stable_key(key: str) -> bool:
+    """Keys that keep their name across releases (the only ones that need invalidation)."""
+    return not _HASHED_KEY_RE.search(os.path.basename(key))
+
+
+def _hashed_key(rel_path: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(rel_path)
+    return f"{stem}.{_sha256(data)[:HASH_LEN]}{ext}"
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 -> deterministic output (same input -> same bytes -> no diff)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _map_refs(text: str, rel_path: str, link) -> str:
+    """
+    Call link(target_rel_path) for every local reference in an HTML or CSS file.
+    link returns the key to point at instead, or None to leave the reference alone.
+    """
+    base = os.path.dirname(rel_path)
+
+    def relink(path):
+        if "://" in path or path.startswith(("//", "data:", "mailto:")):
+            return path
+        absolute = path.startswith("/")
+        if absolute:
+            rel = path.lstrip("/")
+        else:
+            rel = os.path.normpath(os.path.join(base, path)).replace("\\", "/")
+        new_key = link(rel)
+        if new_key is None:
+            return path
+        if absolute:
+            return "/" + new_key
+        return os.path.relpath(new_key, base or ".").replace("\\", "/")
+
+    def repl_path(m):
+        start, end = m.span("path")
+        whole = m.group(0)
+        return whole[:start - m.start()] + relink(m.group("path")) + whole[end - m.start():]
+
+    def repl_srcset(m):
+        candidates = []
+        for candidate in m.group("value").split(","):
+            fields = candidate.split()
+            if fields:
+                fields[0] = relink(fields[0])
+            candidates.append(" ".join(fields))
+        return f"srcset={m.group('q')}{', '.join(candidates)}{m.group('q')}"
+
+    if _is_html(rel_path):
+        text = _ATTR_RE.sub(repl_path, text)
+        text = _SRCSET_RE.sub(repl_srcset, text)
+    text = _CSS_URL_RE.sub(repl_path, text)
+    return _CSS_IMPORT_RE.sub(repl_path, text)
+
+
+def build_assets(src_dir: str, compress: bool = True) -> list:
+    """
+    Build the deployable asset list for src_dir.
+
+    Only files referenced from HTML or CSS are fingerprinted (what JS fetches or imports
+    is invisible here, so everything else keeps its name and is treated like HTML).
+    CSS is rewritten before it is hashed, dependencies first, so a changed image also
+    gives the stylesheet that uses it a new key.
+
+    Each asset is a dict:
+      key, body (bytes), content_type, cache_control, content_encoding (or None), digest
+
+    `digest` covers body + headers, so a header-only change is still detected as a change.
+    """
+    files = {}
+    for root, _, names in os.walk(src_dir):
+        for filename in sorted(names):
+            full_path = os.path.join(root, filename)
+            rel_path = os.path.relpath(full_path, src_dir).replace("\\", "/")
+            with open(full_path, "rb") as f:
+                files[rel_path] = f.read()
+
+    texts = {
+        rel: data.decode("utf-8")
+        for rel, data in files.items()
+        if _is_html(rel) or _is_css(rel)
+    }
+
+    # 1) which files are linked from HTML / CSS
+    referenced = set()
+    for rel, text in texts.items():
+        _map_refs(text, rel, lambda target: referenced.add(target))
+    fingerprint = {
+        rel for rel in referenced
+        if rel in files and not _is_html(rel) and os.path.basename(rel) not in UNHASHED_FILES
+    }
+
+    # 2) final keys, leaves first: rewrite a file's references, then hash the result
+    keys, bodies = {}, {}
+
+    def resolve(rel, chain=()):
+        if rel in keys:
+            return keys[rel]
+        if rel in chain:
+            raise ValueError(f"circular reference: {' -> '.join(chain + (rel,))}")
+        data = files[rel]
+        if rel in texts:
+            link = lambda target: resolve(target, chain + (rel,)) if target in fingerprint else None  # noqa: E731
+            data = _map_refs(texts[rel], rel, link).encode("utf-8")
+        bodies[rel] = data
+        keys[rel] = _hashed_key(rel, data) if rel in fingerprint else rel
+        return keys[rel]
+
+    assets = []
+    for rel_path in sorted(files):
+        key = resolve(rel_path)
+        data = bodies[rel_path]
+        content_type = _content_type(rel_path)
+        cache_control = STABLE_CACHE_CONTROL if key == rel_path else IMMUTABLE_CACHE_CONTROL
+
+        content_encoding = None
+        if compress and _is_compressible(content_type) and len(data) >= COMPRESS_MIN_BYTES:
+            data = _gzip(data)
+            content_encoding = "gzip"
+
+        digest = _sha256(
+            data + f"\n{content_type}\n{cache_control}\n{content_encoding or ''}".encode("utf-8")
+        )
+        assets.append({
+            "key": key,
+            "body": data,
+            "content_type": content_type,
+            "cache_control": cache_control,
+            "content_encoding": content_encoding,
+            "digest": digest,
+        })
+
+    return assets
+
+
+def build_manifest(assets: list) -> dict:
+    return {a["key"]: a["digest"] for a in assets}
+
+
+def load_manifest(raw) -> dict:
+    """
+    Normalize a stored manifest to {"current": {key: digest}, "retired": {key: digest}}.
+    `retired` = keys of the previous release that are no longer built (kept one more release).
+    None (no manifest yet) stays None.
+    """
+    if raw is None:
+        return None
+    if "current" in raw:
+        return {"current": dict(raw["current"]), "retired": dict(raw.get("retired") or {})}
+    return {"current": dict(raw), "retired": {}}  # early flat {key: digest} format
+
+
+def diff_manifests(local: dict, remote, prune: bool = False) -> dict:
+    """
+    Compare the local build ({key: digest}) with the remote manifest (see load_manifest).
+
+    - upload:     new or changed keys
+    - delete:     only with prune; keys that were already retired by the previous deploy
+                  (one-release grace period for open tabs and HTML still cached at the edge)
+    - invalidate: non-fingerprinted keys that were overwritten or deleted
+                  (fingerprinted keys are new names, they are never cached under old content).
+                  Without a remote manifest (first deploy / objects uploaded by hand)
+                  every uploaded non-fingerprinted key plus "/" is invalidated.
+    - manifest:   manifest to store after this deploy
+    """
+    first_deploy = remote is None
+    remote = remote or {"current": {}, "retired": {}}
+    current, retired = remote["current"], remote["retired"]
+
+    upload = sorted(k for k, d in local.items() if current.get(k) != d)
+    newly_retired = {k: d for k, d in current.items() if k not in local}
+    still_retired = {k: d for k, d in retired.items() if k not in local}
+    delete = sorted(still_retired) if prune else []
+    next_retired = newly_retired if prune else {**still_retired, **newly_retired}
+
+    invalidate = set()
+    for key in upload + delete:
+        if not _is_stable_key(key):
+            continue
+        if not first_deploy and key not in current and key not in retired:
+            continue  # brand-new path, nothing cached yet
+        invalidate.add(f"/{key}")
+        # default_root_object: "/" is cached separately from "/index.html"
+        if os.path.basename(key) == "index.html":
+            invalidate.add("/" + os.path.dirname(key) + ("/" if os.path.dirname(key) else ""))
+    if first_deploy:
+        invalidate.update({"/", "/index.html"})
+
+    return {
+        "upload": upload,
+        "delete": delete,
+        "retire": sorted(newly_retired),
+        "invalidate": sorted(invalidate),
+        "manifest": {"current": dict(local), "retired": next_retired},
+    }
+
+
+# -----------------------------
+# AWS side (boto3 imported lazily: `plan` runs without AWS credentials or SDK)
+# -----------------------------
+def fetch_remote_manifest(s3, bucket: str):
+    """Stored manifest, or None when the bucket has never been deployed by this script."""
+    try:
+        resp = s3.get_object(Bucket=bucket, Key=MANIFEST_KEY)
+    except s3.exceptions.NoSuchKey:
+        return None
+    return load_manifest(json.loads(resp["Body"].read()))
+
+
+def _bucket_keys(s3, bucket: str) -> set:
+    keys = set()
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket):
+        keys.update(obj["Key"] for obj in page.get("Contents", []))
+    return keys
+
+
+def mark_missing(remote, existing: set):
+    """
+    Keys the manifest lists but the bucket no longer has (deleted by hand, by an old
+    Pulumi stack, ...) get digest None, so they are uploaded (and invalidated) again.
+    """
+    if remote is None:
+        return None
+    current = {k: (d if k in existing else None) for k, d in remote["current"].items()}
+    return {"current": current, "retired": remote["retired"]}
+
+
+def _put_asset(s3, bucket: str, asset: dict):
+    extra = {}
+    if asset["content_encoding"]:
+        extra["ContentEncoding"] = asset["content_encoding"]
+    s3.put_object(
+        Bucket=bucket,
+        Key=asset["key"],
+        Body=asset["body"],
+        ContentType=asset["content_type"],
+        CacheControl=asset["cache_control"],
+        **extra,
+    )
+    return asset["key"]
+
+
+def deploy(
+    *,
+    src_dir: str,
+    bucket: str,
+    distribution_id: str = None,
+    compress: bool = True,
+    prune: bool = False,
+    dry_run: bool = False,
+    workers: int = UPLOAD_WORKERS,
+) -> dict:
+    import boto3
+
+    s3 = boto3.client("s3")
+
+    assets = build_assets(src_dir, compress=compress)
+    local = build_manifest(assets)
+    remote = mark_missing(fetch_remote_manifest(s3, bucket), _bucket_keys(s3, bucket))
+    plan = diff_manifests(local, remote, prune=prune)
+
+    print(f"[frontend] upload={len(plan['upload'])} delete={len(plan['delete'])} "
+          f"retire={len(plan['retire'])} invalidate={len(plan['invalidate'])} "
+          f"unchanged={len(local) - len(plan['upload'])}")
+    if dry_run:
+        return plan
+
+    by_key = {a["key"]: a for a in assets}
+    # Non-HTML first: new HTML must never reference an asset that is not uploaded yet
+    static = [k for k in plan["upload"] if not _is_html(k)]
+    html = [k for k in plan["upload"] if _is_html(k)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in (static, html):
+            for key in pool.map(lambda k: _put_asset(s3, bucket, by_key[k]), batch):
+                print(f"[frontend] put s3://{bucket}/{key}")
+
+    for i in range(0, len(plan["delete"]), 1000):
+        chunk = plan["delete"][i:i + 1000]
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": k} for k in chunk]})
+        for key in chunk:
+            print(f"[frontend] delete s3://{bucket}/{key}")
+
+    s3.put_object(
+        Bucket=bucket,
+        Key=MANIFEST_KEY,
+        Body=json.dumps(plan["manifest"], indent=2, sort_keys=True).encode("utf-8"),
+        ContentType="application/json",
+        CacheControl="no-store",
+    )
+
+    if distribution_id and plan["invalidate"]:
+        cf = boto3.client("cloudfront")
+        resp = cf.create_invalidation(
+            DistributionId=distribution_id,
+            InvalidationBatch={
+                "Paths": {"Quantity": len(plan["invalidate"]), "Items": plan["invalidate"]},
+                "CallerReference": f"frontend-{int(time.time())}",
+            },
+        )
+        print(f"[frontend] invalidation {resp['Invalidation']['Id']}: {plan['invalidate']}")
+
+    return plan
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fingerprint, diff and deploy frontend assets")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_plan = sub.add_parser("plan", help="diff local build against a manifest file (no AWS)")
+    p_plan.add_argument("--src", default="frontend")
+    p_plan.add_argument("--remote-manifest", help="previous manifest JSON (omit = empty bucket)")
+    p_plan.add_argument("--no-compress", action="store_true")
+    p_plan.add_argument("--prune", action="store_true")
+    p_plan.add_argument("--write-manifest", help="write the post-deploy manifest to this path")
+
+    p_deploy = sub.add_parser("deploy", help="upload changed objects + invalidate changed paths")
+    p_deploy.add_argument("--src", default="frontend")
+    p_deploy.add_argument("--bucket", required=True)
+    p_deploy.add_argument("--distribution-id")
+    p_deploy.add_argument("--no-compress", action="store_true")
+    p_deploy.add_argument(
+        "--prune", action="store_true", help="delete assets retired by the previous deploy (one-release grace)"
+    )
+    p_deploy.add_argument("--dry-run", action="store_true")
+    p_deploy.add_argument("--workers", type=int, default=UPLOAD_WORKERS)
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "plan":
+        assets = build_assets(args.src, compress=not args.no_compress)
+        local = build_manifest(assets)
+        remote = None
+        if args.remote_manifest:
+            with open(args.remote_manifest, "r", encoding="utf-8") as f:
+                remote = load_manifest(json.load(f))
+        plan = diff_manifests(local, remote, prune=args.prune)
+        if args.write_manifest:
+            with open(args.write_manifest, "w", encoding="utf-8") as f:
+                json.dump(plan.pop("manifest"), f, indent=2, sort_keys=True)
+        else:
+            plan.pop("manifest")
+        json.dump(plan, sys.stdout, indent=2)
+        print()
+        return 0
+
+    deploy(
+        src_dir=args.src,
+        bucket=args.bucket,
+        distribution_id=args.distribution_id,
+        compress=not args.no_compress,
+        prune=args.prune,
+        dry_run=args.dry_run,
+        workers=args.workers,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,13 +3,21 @@ import pulumi
 import pulumi_aws as aws
 
 
-def deploy_phase2(ecr_repo_url: pulumi.Input[str]):
+def deploy_phase2(ecr_repo_url: pulumi.Input[str], assets_bucket_name: pulumi.Input[str]):
     project = pulumi.get_project()
     stack = pulumi.get_stack()
 
     # 你 Phase 1 已 push 的 image tag
     image_uri = pulumi.Output.concat(ecr_repo_url, f":{stack}-latest")
 
+    # Optional HTTPS on ALB (needs an ACM cert for a domain that points at the ALB)
+    #   pulumi config set alb_certificate_arn arn:aws:acm:...
+    #   pulumi config set alb_origin_domain api-origin.example.com
+    config = pulumi.Config()
+    alb_certificate_arn = config.get("alb_certificate_arn")
+    alb_origin_domain = config.get("alb_origin_domain")
+    alb_https = bool(alb_certificate_arn and alb_origin_domain)
+
 
     # -----------------------------
     # Network: Minimal public VPC
@@ -78,6 +86,17 @@ def deploy_phase2(ecr_repo_url: pulumi.Input[str]):
         cidr_blocks=["0.0.0.0/0"],
     )
 
+    if alb_https:
+        aws.ec2.SecurityGroupRule(
+            "albSgIngressHttps",
+            type="ingress",
+            security_group_id=alb_sg.id,
+            protocol="tcp",
+            from_port=443,
+            to_port=443,
+            cidr_blocks=["0.0.0.0/0"],
+        )
+
     # ALB -> targets (ECS tasks)
     # 這條是關鍵：沒有 egress，ALB health check 會 Target.Timeout，最後變 503
     aws.ec2.SecurityGroupRule(
@@ -229,6 +248,23 @@ def deploy_phase2(ecr_repo_url: pulumi.Input[str]):
         policy_arn=bedrock_invoke_managed_policy.arn,
     )
 
+    # Usage ledger: rotated segments -> assets bucket (write-only, single prefix)
+    aws.iam.RolePolicy(
+        "taskRoleUsageLedgerPolicy",
+        role=task_role.id,
+        policy=pulumi.Output.from_input(assets_bucket_name).apply(lambda bucket: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Sid": "UsageLedgerPut",
+                    "Effect": "Allow",
+                    "Action": ["s3:PutObject"],
+                    "Resource": f"arn:aws:s3:::{bucket}/usage-ledger/*",
+                }
+            ]
+        })),
+    )
+
     # -----------------------------
     # ALB + Target Group + Listener
     # -----------------------------
@@ -237,6 +273,12 @@ def deploy_phase2(ecr_repo_url: pulumi.Input[str]):
         load_balancer_type="application",
         security_groups=[alb_sg.id],
         subnets=[s.id for s in public_subnets],
+        # enable_http2 is the ALB default and only applies to HTTPS listeners; with the
+        # default HTTP:80 listener (no alb_certificate_arn) there is no HTTP/2 anywhere.
+        # ALB -> target stays HTTP/1.1 keep-alive either way.
+        # > CloudFront origin keep-alive (60s) so the ALB never drops a reused connection;
+        # backend uvicorn --timeout-keep-alive is longer still (130s)
+        idle_timeout=120,
         tags={"Project": project, "Stack": stack},
     )
 
@@ -265,6 +307,22 @@ def deploy_phase2(ecr_repo_url: pulumi.Input[str]):
         )],
     )
 
+    listeners = [listener]
+    if alb_https:
+        https_listener = aws.lb.Listener(
+            "appHttpsListener",
+            load_balancer_arn=lb.arn,
+            port=443,
+            protocol="HTTPS",
+            ssl_policy="ELBSecurityPolicy-TLS13-1-2-2021-06",
+            certificate_arn=alb_certificate_arn,
+            default_actions=[aws.lb.ListenerDefaultActionArgs(
+                type="forward",
+                target_group_arn=tg.arn,
+            )],
+        )
+        listeners.append(https_listener)
+
     # -----------------------------
     # ECS Task Definition + Service
     # -----------------------------
@@ -285,6 +343,9 @@ def deploy_phase2(ecr_repo_url: pulumi.Input[str]):
                 "containerPort": 8080,
                 "protocol": "tcp"
             }],
+            "environment": [
+                {"name": "USAGE_LEDGER_BUCKET", "value": assets_bucket_name},
+            ],
             "logConfiguration": {
                 "logDriver": "awslogs",
                 "options": {
@@ -316,7 +377,7 @@ def deploy_phase2(ecr_repo_url: pulumi.Input[str]):
             container_port=8080,
         )],
         opts=pulumi.ResourceOptions(
-            depends_on=[listener],
+            depends_on=listeners,
         ),
         tags={"Project": project, "Stack": stack},
     )
@@ -327,6 +388,9 @@ def deploy_phase2(ecr_repo_url: pulumi.Input[str]):
 
     return {
         "alb_dns_name": lb.dns_name,
+        # CloudFront origin: custom domain (cert match) when HTTPS, else ALB DNS over HTTP
+        "alb_origin_domain": alb_origin_domain if alb_https else lb.dns_name,
+        "alb_https": alb_https,
         "lb": lb,
         "tg": tg,
         "cluster": cluster,
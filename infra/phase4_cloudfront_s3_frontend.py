@@ -1,39 +1,12 @@
-import os
 import json
-import mimetypes
 
 import pulumi
 import pulumi_aws as aws
 
+# AWS managed policies (fixed IDs)
+CACHING_DISABLED_POLICY_ID = "4135ea2d-6df8-44a3-9df3-4b5a84be39ad"        # Managed-CachingDisabled
+ALL_VIEWER_EXCEPT_HOST_POLICY_ID = "b689b0a8-53d0-40ab-baf2-68738e2966ac"  # Managed-AllViewerExceptHostHeader
 
-def upload_dir_as_s3_objects(bucket_name: pulumi.Input[str], src_dir: str):
-    """
-    Upload all files under src_dir to S3 bucket as objects.
-    Good for MVP / demo. For production, prefer CI/CD sync (aws s3 sync) + invalidation.
-    """
-    if not os.path.isdir(src_dir):
-        pulumi.log.warn(f"[frontend] directory not found: {src_dir} (skip upload)")
-        return []
-
-    objects = []
-    for root, _, files in os.walk(src_dir):
-        for filename in files:
-            full_path = os.path.join(root, filename)
-            rel_path = os.path.relpath(full_path, src_dir).replace("\\", "/")
-
-            content_type, _ = mimetypes.guess_type(full_path)
-            content_type = content_type or "application/octet-stream"
-
-            obj = aws.s3.BucketObject(
-                f"frontend-{rel_path.replace('/', '-')}",
-                bucket=bucket_name,
-                key=rel_path,
-                source=pulumi.FileAsset(full_path),
-                content_type=content_type,
-            )
-            objects.append(obj)
-
-    return objects
 
 def build_phase4_cloudfront_s3_frontend(
     *,
@@ -41,13 +14,16 @@ def build_phase4_cloudfront_s3_frontend(
     stack: str,
     common_tags: dict,
     alb_dns_name: pulumi.Input[str],
-    frontend_dir: str = "../frontend",
+    alb_https: bool = False,
 ):
     """
     CloudFront single entrypoint (HTTPS) with 2 origins:
       - default behavior: S3 static frontend
-      - /api/* behavior: ALB backend (HTTP origin ok)
+      - /api/* behavior: ALB backend (HTTPS origin when alb_https, else HTTP)
     This avoids browser mixed-content issues.
+
+    Bucket contents are owned by CI (infra/frontend_assets.py deploy), not by Pulumi:
+    one owner keeps the asset manifest, the prune grace period and invalidations consistent.
     """
 
     # -------------------------
@@ -68,9 +44,6 @@ def build_phase4_cloudfront_s3_frontend(
         restrict_public_buckets=True,
     )
 
-    # Upload frontend (MVP)
-    upload_dir_as_s3_objects(frontend_bucket.bucket, frontend_dir)
-
     # -------------------------
     # CloudFront OAC for S3
     # -------------------------
@@ -83,6 +56,44 @@ def build_phase4_cloudfront_s3_frontend(
         signing_protocol="sigv4",
     )
 
+    # -------------------------
+    # API behavior (no caching)
+    # -------------------------
+    if alb_https:
+        # HTTPS origin: CloudFront validates the ALB certificate against the Host it sends.
+        # Forwarding the viewer Host (*.cloudfront.net) would never match alb_origin_domain
+        # and every /api/* call would 502, so forward everything except Host.
+        api_behavior = aws.cloudfront.DistributionOrderedCacheBehaviorArgs(
+            path_pattern="/api/*",
+            target_origin_id="alb-backend",
+            viewer_protocol_policy="redirect-to-https",
+            allowed_methods=["GET", "HEAD", "OPTIONS", "PUT", "POST", "PATCH", "DELETE"],
+            cached_methods=["GET", "HEAD"],
+            compress=True,
+            cache_policy_id=CACHING_DISABLED_POLICY_ID,
+            origin_request_policy_id=ALL_VIEWER_EXCEPT_HOST_POLICY_ID,
+        )
+    else:
+        api_behavior = aws.cloudfront.DistributionOrderedCacheBehaviorArgs(
+            path_pattern="/api/*",
+            target_origin_id="alb-backend",
+            viewer_protocol_policy="redirect-to-https",
+            allowed_methods=["GET", "HEAD", "OPTIONS", "PUT", "POST", "PATCH", "DELETE"],
+            cached_methods=["GET", "HEAD"],
+            compress=True,
+            # Disable caching for APIs
+            min_ttl=0,
+            default_ttl=0,
+            max_ttl=0,
+            forwarded_values=aws.cloudfront.DistributionOrderedCacheBehaviorForwardedValuesArgs(
+                query_string=True,
+                headers=["*"],
+                cookies=aws.cloudfront.DistributionOrderedCacheBehaviorForwardedValuesCookiesArgs(
+                    forward="all"
+                ),
+            ),
+        )
+
     # -------------------------
     # CloudFront Distribution
     # -------------------------
@@ -106,8 +117,12 @@ def build_phase4_cloudfront_s3_frontend(
                 custom_origin_config=aws.cloudfront.DistributionOriginCustomOriginConfigArgs(
                     http_port=80,
                     https_port=443,
-                    origin_protocol_policy="http-only",
+                    origin_protocol_policy="https-only" if alb_https else "http-only",
                     origin_ssl_protocols=["TLSv1.2"],
+                    # Long generations: wait up to 60s for the first byte (default 30s)
+                    origin_read_timeout=60,
+                    # Reuse origin connections across requests (must be < ALB idle_timeout)
+                    origin_keepalive_timeout=60,
                 ),
             ),
         ],
@@ -126,25 +141,7 @@ def build_phase4_cloudfront_s3_frontend(
         ),
         ordered_cache_behaviors=[
             # API: /api/* -> ALB
-            aws.cloudfront.DistributionOrderedCacheBehaviorArgs(
-                path_pattern="/api/*",
-                target_origin_id="alb-backend",
-                viewer_protocol_policy="redirect-to-https",
-                allowed_methods=["GET", "HEAD", "OPTIONS", "PUT", "POST", "PATCH", "DELETE"],
-                cached_methods=["GET", "HEAD"],
-                compress=True,
-                # Disable caching for APIs
-                min_ttl=0,
-                default_ttl=0,
-                max_ttl=0,
-                forwarded_values=aws.cloudfront.DistributionOrderedCacheBehaviorForwardedValuesArgs(
-                    query_string=True,
-                    headers=["*"],
-                    cookies=aws.cloudfront.DistributionOrderedCacheBehaviorForwardedValuesCookiesArgs(
-                        forward="all"
-                    ),
-                ),
-            )
+            api_behavior,
         ],
         restrictions=aws.cloudfront.DistributionRestrictionsArgs(
             geo_restriction=aws.cloudfront.DistributionRestrictionsGeoRestrictionArgs(